@@ -1,6 +1,18 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response
+from flask.json.provider import DefaultJSONProvider
 import os
+import hashlib
+import queue
+import re
+import struct
+import threading
+import time
+import orjson
 import pyodbc
+import redis
+from concurrent.futures import Future
+from contextlib import contextmanager, ExitStack
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import datetime, date
@@ -9,7 +21,23 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 # Load .env from project root
 load_dotenv(Path(__file__).resolve().parent / ".env")
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify()/get_json() via orjson; types orjson can't encode go through Flask's default()."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "change-me")
 
 # ✅ Azure/Codespaces reverse-proxy => https detect + cookies work
@@ -19,6 +47,9 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_SECURE"] = (os.environ.get("COOKIE_SECURE", "1") == "1")
 
+# ✅ reject oversized bodies (e.g. bulk WSR uploads) with 413 before reading them
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", "1000000"))
+
 
 # ===================== DB HELPERS =====================
 def _must_env(name: str) -> str:
@@ -28,23 +59,222 @@ def _must_env(name: str) -> str:
     return v
 
 
-def get_conn():
+# ✅ keep the driver manager pool on; our own pool below keeps sessions warm
+pyodbc.pooling = True
+
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+# connections opened per worker at startup (see gunicorn.conf.py); 0 = lazy
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "0"))
+# idle connections older than this are pinged before reuse (Azure drops idle TCP)
+DB_POOL_IDLE_CHECK = int(os.environ.get("DB_POOL_IDLE_CHECK", "60"))
+
+# optional TDS packet size in bytes (512-32767); unset keeps the driver default
+DB_PACKET_SIZE = int(os.environ.get("DB_PACKET_SIZE", "0"))
+
+_POOL = queue.LifoQueue(maxsize=DB_POOL_MAX)
+
+
+# ✅ AZURE_SQL_AAD=1 => Azure AD access token instead of Uid/Pwd (needs azure-identity)
+AZURE_SQL_AAD = (os.environ.get("AZURE_SQL_AAD", "0") == "1")
+_SQL_COPT_SS_ACCESS_TOKEN = 1256
+_AAD_SCOPE = "https://database.windows.net/.default"
+# refresh this many seconds before the token expires
+_AAD_REFRESH_MARGIN = 300
+
+_aad_credential = None
+_aad_token = None  # (packed token bytes, expires_on epoch)
+_AAD_LOCK = threading.Lock()
+
+
+def _conn_str() -> str:
     server = _must_env("AZURE_SQL_SERVER")
     db     = _must_env("AZURE_SQL_DB")
-    user   = _must_env("AZURE_SQL_USER")
-    pwd    = _must_env("AZURE_SQL_PASSWORD")
 
-    conn_str = (
+    if AZURE_SQL_AAD:
+        auth = ""
+    else:
+        user = _must_env("AZURE_SQL_USER")
+        pwd  = _must_env("AZURE_SQL_PASSWORD")
+        auth = f"Uid={user};Pwd={pwd};"
+
+    # larger TDS packets => fewer network packets for the 500-row list pages
+    packet = f"Packet Size={DB_PACKET_SIZE};" if DB_PACKET_SIZE else ""
+
+    return (
         "Driver={ODBC Driver 18 for SQL Server};"
         f"Server=tcp:{server},1433;"
         f"Database={db};"
-        f"Uid={user};Pwd={pwd};"
+        f"{auth}"
         "Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;"
+        f"{packet}"
     )
-    return pyodbc.connect(conn_str)
 
 
-def _table_columns(schema_table: str):
+def _aad_token_bytes() -> bytes:
+    """Access token packed for SQL_COPT_SS_ACCESS_TOKEN; fetched once, reused until near expiry."""
+    global _aad_credential, _aad_token
+    tok = _aad_token
+    if tok and time.time() < tok[1] - _AAD_REFRESH_MARGIN:
+        return tok[0]
+
+    with _AAD_LOCK:
+        tok = _aad_token
+        if tok and time.time() < tok[1] - _AAD_REFRESH_MARGIN:
+            return tok[0]
+        if _aad_credential is None:
+            from azure.identity import DefaultAzureCredential
+            _aad_credential = DefaultAzureCredential()
+        at = _aad_credential.get_token(_AAD_SCOPE)
+        raw = at.token.encode("utf-16-le")
+        _aad_token = (struct.pack("=i", len(raw)) + raw, at.expires_on)
+        return _aad_token[0]
+
+
+# pooled connections idle in autocommit: reads then need no COMMIT round trip
+# at the end; get_conn(write=True) opens a transaction for the write paths
+def _connect():
+    if AZURE_SQL_AAD:
+        return pyodbc.connect(_conn_str(), autocommit=True,
+                              attrs_before={_SQL_COPT_SS_ACCESS_TOKEN: _aad_token_bytes()})
+    return pyodbc.connect(_conn_str(), autocommit=True)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _checkout():
+    while True:
+        try:
+            conn, last_used = _POOL.get_nowait()
+        except queue.Empty:
+            return _connect()
+
+        if time.monotonic() - last_used < DB_POOL_IDLE_CHECK:
+            return conn
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1").fetchall()
+            cur.close()
+            return conn
+        except Exception:
+            _close_quietly(conn)
+
+
+def _checkin(conn):
+    try:
+        _POOL.put_nowait((conn, time.monotonic()))
+    except queue.Full:
+        _close_quietly(conn)
+
+
+def reset_pool():
+    """Forget pooled connections (called in each Gunicorn worker after fork)."""
+    global _POOL
+    _POOL = queue.LifoQueue(maxsize=DB_POOL_MAX)
+
+
+def warm_pool(n=None):
+    """Pre-open up to n (DB_POOL_MIN) connections so the first requests skip the login handshake."""
+    n = min(DB_POOL_MIN if n is None else n, DB_POOL_MAX)
+    for _ in range(max(0, n - _POOL.qsize())):
+        try:
+            _checkin(_connect())
+        except Exception:
+            # DB not reachable yet; requests will connect on demand
+            break
+
+
+class _PooledConn:
+    """The connection handed out by get_conn(): remembers every cursor it opens
+    so they can all be closed before the connection goes back to the pool
+    (a cursor with pending results would make the next borrower fail with
+    "Connection is busy with results for another hstmt")."""
+
+    __slots__ = ("_conn", "_cursors")
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_cursors", [])
+
+    def cursor(self):
+        cur = self._conn.cursor()
+        self._cursors.append(cur)
+        return cur
+
+    def close_cursors(self):
+        for cur in self._cursors:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self._cursors.clear()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+@contextmanager
+def get_conn(write: bool = False):
+    """Borrow a pooled (autocommit) connection.
+
+    With write=True the block runs in one transaction that commits on success
+    like `with pyodbc.connect()`. Cursors opened in the block are closed
+    before check-in. A connection that raised is closed instead of going back
+    to the pool, since it may be left mid-transaction or with a dead socket.
+    """
+    conn = _checkout()
+    pooled = _PooledConn(conn)
+    try:
+        if write:
+            conn.autocommit = False
+        yield pooled
+        pooled.close_cursors()
+        if write:
+            conn.commit()
+            conn.autocommit = True
+    except BaseException:
+        if write:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        _close_quietly(conn)
+        raise
+    _checkin(conn)
+
+
+# str params are bound as nvarchar(200) (the width _cmp_ci_trim casts to) so
+# every call sends the same "@P1 nvarchar(200)" signature and reuses one plan,
+# instead of pyodbc sizing each to its value; longer strings keep the default
+PARAM_STR_WIDTH = 200
+
+
+def _execute(cur, sql, params=()):
+    if params:
+        cur.setinputsizes([
+            (pyodbc.SQL_WVARCHAR, PARAM_STR_WIDTH, 0)
+            if type(p) is str and len(p) <= PARAM_STR_WIDTH else None
+            for p in params
+        ])
+    return cur.execute(sql, params)
+
+
+# schema is static between deploys; re-read INFORMATION_SCHEMA at most every TTL
+SCHEMA_CACHE_TTL = int(os.environ.get("SCHEMA_CACHE_TTL", "300"))
+
+_COLS_CACHE = {}
+_COLS_LOCK = threading.Lock()
+_COLS_GEN = [0]  # bumped by flush_schema_cache
+
+
+def _load_table_columns(schema_table: str):
     if "." not in schema_table:
         schema, table = "dbo", schema_table
     else:
@@ -53,45 +283,111 @@ def _table_columns(schema_table: str):
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
-            SELECT COLUMN_NAME
+            SELECT COLUMN_NAME, DATA_TYPE
             FROM INFORMATION_SCHEMA.COLUMNS
             WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
             ORDER BY ORDINAL_POSITION
         """, (schema, table))
-        return [r[0] for r in cur.fetchall()]
+        rows = cur.fetchall()
+
+        # full-text indexed columns (empty when the table has no FULLTEXT index)
+        try:
+            cur.execute("""
+                SELECT c.name
+                FROM sys.fulltext_index_columns fic
+                JOIN sys.columns c ON c.object_id = fic.object_id AND c.column_id = fic.column_id
+                WHERE fic.object_id = OBJECT_ID(?)
+            """, (f"{schema}.{table}",))
+            ft_cols = frozenset(r[0] for r in cur.fetchall())
+        except pyodbc.Error:
+            ft_cols = frozenset()
+
+        return tuple(r[0] for r in rows), {r[0]: (r[1] or "").lower() for r in rows}, ft_cols
+
+
+def _table_schema(schema_table: str):
+    """(column tuple, {column: DATA_TYPE}, full-text columns) for a table, cached for SCHEMA_CACHE_TTL."""
+    hit = _COLS_CACHE.get(schema_table)
+    if hit and time.monotonic() - hit[0] < SCHEMA_CACHE_TTL:
+        return hit[1]
+
+    # query outside the lock, one load per table at a time; the lock only guards the swap
+    gen = _COLS_GEN[0]
+    schema = _single_flight(f"schema:{schema_table}", lambda: _load_table_columns(schema_table))
+    with _COLS_LOCK:
+        if _COLS_GEN[0] == gen:  # skip if flush_schema_cache ran mid-load
+            _COLS_CACHE[schema_table] = (time.monotonic(), schema)
+    return schema
+
+
+def _table_columns(schema_table: str):
+    """Column names of a table (cached tuple, so it can key other caches)."""
+    return _table_schema(schema_table)[0]
+
+
+def _column_types(schema_table: str):
+    return _table_schema(schema_table)[1]
 
 
+def _fulltext_columns(schema_table: str):
+    return _table_schema(schema_table)[2]
+
+
+def flush_schema_cache():
+    with _COLS_LOCK:
+        _COLS_CACHE.clear()
+        _COLS_GEN[0] += 1
+
+
+@lru_cache(maxsize=4096)
 def _norm(s: str) -> str:
-    return "".join(ch.lower() for ch in str(s) if ch.isalnum())
+    # filter/map/join run in C; same result as the old per-char generator
+    return "".join(map(str.lower, filter(str.isalnum, str(s))))
+
+
+@lru_cache(maxsize=64)
+def _norm_cols(cols: tuple):
+    return tuple((_norm(c), c) for c in cols)
+
+
+@lru_cache(maxsize=64)
+def _col_index_cached(cols: tuple):
+    return {nc: c for nc, c in _norm_cols(cols)}
 
 
 def _col_index(cols):
-    return {_norm(c): c for c in cols}
+    return _col_index_cached(tuple(cols))
 
 
-def _find_col(cols, aliases=None, must_contain=None):
-    aliases = aliases or []
-    idx = _col_index(cols)
+@lru_cache(maxsize=2048)
+def _find_col_cached(cols: tuple, aliases: tuple, must_contain: tuple):
+    idx = _col_index_cached(cols)
 
     for a in aliases:
-        na = _norm(a)
-        if na in idx:
-            return idx[na]
+        hit = idx.get(_norm(a))
+        if hit:
+            return hit
 
     if must_contain:
         tokens = [_norm(t) for t in must_contain if t]
-        for c in cols:
-            nc = _norm(c)
+        for nc, c in _norm_cols(cols):
             if all(t in nc for t in tokens):
                 return c
     return None
 
 
+def _find_col(cols, aliases=None, must_contain=None):
+    # results only depend on the (cached) column tuple, so memoize per schema
+    return _find_col_cached(tuple(cols), tuple(aliases or ()), tuple(must_contain or ()))
+
+
+@lru_cache(maxsize=512)
 def _qcol(c: str) -> str:
-    return f"[{c}]"
+    # column names come from a small fixed vocabulary; "]" must be doubled inside [...]
+    return "[" + c.replace("]", "]]") + "]"
 
 
-def _json_safe(v):
+def _json_safe_slow(v):
     if v is None:
         return ""
     if isinstance(v, (datetime, date)):
@@ -99,6 +395,21 @@ def _json_safe(v):
     return str(v)
 
 
+# exact-type dispatch for the common cell types; subclasses/others take the slow path
+_JSON_SAFE_BY_TYPE = {
+    str: str,
+    type(None): lambda v: "",
+    int: str,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+}
+
+
+def _json_safe(v):
+    conv = _JSON_SAFE_BY_TYPE.get(type(v))
+    return conv(v) if conv is not None else _json_safe_slow(v)
+
+
 def _parse_iso_date(v):
     """HTML <input type="date"> => YYYY-MM-DD"""
     if v is None:
@@ -116,6 +427,21 @@ def _json_err(msg, code=400):
     return jsonify({"error": msg}), code
 
 
+# short-circuit bodies (fire on every autocomplete keystroke) are encoded once;
+# each request still gets its own Response since after_request may set cookies
+_EMPTY_ITEMS_BODY = orjson.dumps({"items": []})
+_EMPTY_ROWS_BODY = orjson.dumps({"ok": True, "rows": []})
+_NO_ROWS_BODY = orjson.dumps({"ok": False, "rows": []})
+
+
+def _json_bytes(body: bytes, code=200):
+    return Response(body, status=code, mimetype="application/json")
+
+
+def _empty_items(code=200):
+    return _json_bytes(_EMPTY_ITEMS_BODY, code)
+
+
 def _require_login_json():
     if "user" not in session:
         return jsonify({"error": "unauthorized"}), 401
@@ -123,17 +449,189 @@ def _require_login_json():
 
 
 # ✅ helper: case-insensitive trim compare expression
+@lru_cache(maxsize=512)
 def _cmp_ci_trim(colname: str) -> str:
     c = f"CAST({_qcol(colname)} AS NVARCHAR(200))"
     # remove NBSP (CHAR(160)) and tabs, then trim + upper
     return f"UPPER(LTRIM(RTRIM(REPLACE(REPLACE({c}, CHAR(160), ' '), CHAR(9), ''))))"
 
 
+# ✅ same compare, but via a persisted computed column "<col>_N" when the table
+# has one; that predicate can seek, the expression above always scans. e.g.
+#   ALTER TABLE dbo.InstallBase ADD [Serial_No_N] AS
+#     UPPER(LTRIM(RTRIM(REPLACE(REPLACE(CAST([Serial_No] AS NVARCHAR(200)), CHAR(160), ' '), CHAR(9), '')))) PERSISTED;
+#   CREATE NONCLUSTERED INDEX IX_InstallBase_Serial_No_N ON dbo.InstallBase([Serial_No_N]);
+# (same for the customer, zone and engineer columns of InstallBase / WSR)
+def _ci_trim_expr(cols, colname: str) -> str:
+    key_col = f"{colname}_N"
+    return _qcol(key_col) if key_col in cols else _cmp_ci_trim(colname)
+
+
+# ===================== STREAMING =====================
+# rows per fetchmany(); also used as cursor.arraysize so the driver fetches in blocks
+STREAM_BATCH = int(os.environ.get("STREAM_BATCH", "500"))
+
+
+def _stream_rows(sql, params, cols, limit, page_keys=None, head=None, fallback=None):
+    """Run a SELECT and stream {"columns": [...], "rows": [...]} while fetching.
+
+    The query executes before the response starts, so SQL errors still reach
+    the caller's try/except. The pooled connection is held until the last
+    batch is written. page_keys maps a JSON key (e.g. "next_after_id") to a
+    column index; when a full page came back, the last row's values are
+    emitted so the client can ask for the next page. cols=None takes the
+    row keys from the cursor; head (a non-empty dict) replaces the
+    {"columns": ...} keys written before "rows". fallback is an optional
+    (sql, params) run instead when the first statement raises a SQL error.
+    """
+    with ExitStack() as stack:
+        conn = stack.enter_context(get_conn())
+        cur = conn.cursor()
+        cur.arraysize = STREAM_BATCH
+        try:
+            _execute(cur, sql, params)
+        except pyodbc.Error:
+            if fallback is None:
+                raise
+            # e.g. a search term full-text CONTAINS can't parse: plain LIKE form
+            _execute(cur, *fallback)
+        stack = stack.pop_all()
+
+    if cols is None:
+        cols = tuple(d[0] for d in cur.description)
+    if head is None:
+        head = {"columns": list(cols)}
+
+    dumps = orjson.dumps
+
+    def gen():
+        with stack:
+            yield dumps(head)[:-1] + b',"rows":['
+            count = 0
+            last = None
+            while True:
+                batch = cur.fetchmany()
+                if not batch:
+                    break
+                # one orjson call per batch; strip its [ ] to splice into "rows"
+                chunk = dumps([dict(zip(cols, map(_json_safe, r))) for r in batch])[1:-1]
+                yield (b"," if count else b"") + chunk
+                count += len(batch)
+                last = batch[-1]
+
+            tail = {}
+            for key, i in (page_keys or {}).items():
+                tail[key] = _json_safe(last[i]) if (last is not None and count >= limit) else None
+            yield b"]" + b"".join(b"," + dumps(k) + b":" + dumps(v) for k, v in tail.items()) + b"}"
+
+    return Response(gen(), mimetype="application/json")
+
+
+# ===================== RESULT CACHE =====================
+# REDIS_URL set => shared across workers; otherwise a small per-process dict
+REDIS_URL = os.environ.get("REDIS_URL", "")
+SUGGEST_CACHE_TTL = int(os.environ.get("SUGGEST_CACHE_TTL", "60"))
+KPI_CACHE_TTL = int(os.environ.get("KPI_CACHE_TTL", "60"))
+DETAILS_CACHE_TTL = int(os.environ.get("DETAILS_CACHE_TTL", "300"))
+LOCAL_CACHE_MAX = 4096
+# seconds; a hung Redis should fall back to SQL, not hold a worker thread
+REDIS_TIMEOUT = float(os.environ.get("REDIS_TIMEOUT", "0.2"))
+
+_redis = redis.Redis.from_url(
+    REDIS_URL, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+) if REDIS_URL else None
+_LOCAL_CACHE = {}
+_LOCAL_CACHE_LOCK = threading.Lock()
+
+
+def _cache_key(prefix: str, where_sql: str, params, q: str = "") -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(where_sql.encode("utf-8"))
+    for p in params:
+        h.update(b"\x00" + str(p).encode("utf-8"))
+    h.update(b"\x01" + q.lower().encode("utf-8"))
+    return f"{prefix}:{h.hexdigest()}"
+
+
+def _cache_get(key: str):
+    if _redis is not None:
+        try:
+            raw = _redis.get(key)
+        except redis.RedisError:
+            return None
+        return orjson.loads(raw) if raw else None
+
+    hit = _LOCAL_CACHE.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    return None
+
+
+def _cache_set(key: str, value, ttl: int):
+    if _redis is not None:
+        try:
+            _redis.setex(key, ttl, orjson.dumps(value))
+        except redis.RedisError:
+            pass
+        return
+
+    now = time.monotonic()
+    with _LOCAL_CACHE_LOCK:
+        if len(_LOCAL_CACHE) >= LOCAL_CACHE_MAX:
+            for k in [k for k, (exp, _) in _LOCAL_CACHE.items() if exp <= now]:
+                del _LOCAL_CACHE[k]
+            if len(_LOCAL_CACHE) >= LOCAL_CACHE_MAX:
+                _LOCAL_CACHE.clear()
+        _LOCAL_CACHE[key] = (now + ttl, value)
+
+
+def _cache_clear(prefix: str):
+    """Drop every cached entry whose key starts with "<prefix>:"."""
+    if _redis is not None:
+        try:
+            keys = list(_redis.scan_iter(match=f"{prefix}:*", count=500))
+            for i in range(0, len(keys), 500):
+                _redis.delete(*keys[i:i + 500])
+        except redis.RedisError:
+            pass
+        return
+
+    with _LOCAL_CACHE_LOCK:
+        for k in [k for k in _LOCAL_CACHE if k.startswith(prefix + ":")]:
+            del _LOCAL_CACHE[k]
+
+
+# a burst of identical requests (keystrokes, several tabs) that all miss the
+# cache at once would each run the query; the first one runs it, the rest
+# wait for its result (per process)
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _single_flight(key: str, load):
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT[key] = Future()
+    if not leader:
+        return fut.result()
+
+    try:
+        fut.set_result(load())
+    except BaseException as e:
+        fut.set_exception(e)
+    finally:
+        with _INFLIGHT_LOCK:
+            del _INFLIGHT[key]
+    return fut.result()
+
+
 # ===================== AUTH =====================
 def get_user(username: str):
     with get_conn() as conn:
         cur = conn.cursor()
-        cur.execute("""
+        _execute(cur, """
             SELECT Username, FullName, Zone, RoleName, Team, Password, IsActive
             FROM dbo.UserLogin
             WHERE Username = ?
@@ -206,20 +704,71 @@ def installbase_update():
     return render_template("installbaseForm.html")
 
 
+# ===================== WHERE BUILDER =====================
+class WhereBuilder:
+    """AND-ed WHERE conditions with their ? params, kept in placeholder order."""
+
+    __slots__ = ("parts", "params")
+
+    def __init__(self, parts=(), params=()):
+        self.parts = list(parts)
+        self.params = list(params)
+
+    def add(self, cond: str, *params):
+        self.parts.append(cond)
+        self.params.extend(params)
+        return self
+
+    def merge(self, other: "WhereBuilder"):
+        self.parts.extend(other.parts)
+        self.params.extend(other.params)
+        return self
+
+    def copy(self) -> "WhereBuilder":
+        return WhereBuilder(self.parts, self.params)
+
+    def sql(self) -> str:
+        return (" WHERE " + " AND ".join(self.parts)) if self.parts else ""
+
+
 # ===================== SCOPES =====================
+_MANAGER_MARKERS = ("manager", "team leader", "teamleader", "team_leader")
+
+
+# substring match on purpose ("Zone Manager", "Sr. Team Leader", ...); there
+# are only a handful of distinct role strings, so each is checked once
+@lru_cache(maxsize=64)
 def _is_manager_like(role: str) -> bool:
     r = (role or "").strip().lower()
-    return ("manager" in r) or ("team leader" in r) or ("teamleader" in r) or ("team_leader" in r)
+    return any(m in r for m in _MANAGER_MARKERS)
 
 
-# ✅✅ FINAL FIX: USER = zone + SERVICE ENGINEER ONLY (sales engineer removed)
-def _installbase_scope_where(install_cols):
+def _session_scope():
     role = (session.get("role") or "").strip().lower()
     zone = (session.get("zone") or "").strip()
     eng  = (session.get("engineer") or "").strip()
+    return role, zone, eng
+
 
+def _role_kind(role: str) -> str:
     if role == "admin":
-        return "", []
+        return "admin"
+    return "manager" if _is_manager_like(role) else "user"
+
+
+def _scope_params(slots, zone, eng):
+    return [zone if s == "zone" else eng for s in slots]
+
+
+# The scope conditions only depend on the schema and the *shape* of the session
+# (role kind, zone/engineer present), so they are built once per shape and
+# shared by every user; the zone/engineer values are bound per request.
+
+# ✅✅ FINAL FIX: USER = zone + SERVICE ENGINEER ONLY (sales engineer removed)
+@lru_cache(maxsize=64)
+def _installbase_scope_sql(install_cols: tuple, kind: str, has_zone: bool, has_eng: bool):
+    if kind == "admin":
+        return (), ()
 
     zone_col = _find_col(install_cols, aliases=["ZONE"], must_contain=["zone"])
     svc_col  = _find_col(
@@ -229,78 +778,323 @@ def _installbase_scope_where(install_cols):
     )
 
     where = []
-    params = []
+    slots = []
 
     # Manager/Team Leader => only zone
-    if _is_manager_like(role):
-        if zone and zone_col:
-            where.append(f"{_cmp_ci_trim(zone_col)} = UPPER(?)")
-            params.append(zone)
-        return (" WHERE " + " AND ".join(where)) if where else "", params
+    if kind == "manager":
+        if has_zone and zone_col:
+            where.append(f"{_ci_trim_expr(install_cols, zone_col)} = UPPER(?)")
+            slots.append("zone")
+        return tuple(where), tuple(slots)
 
     # User => zone + service engineer
-    if eng and svc_col:
-        where.append(f"{_cmp_ci_trim(svc_col)} = UPPER(?)")
-        params.append(eng)
+    if has_eng and svc_col:
+        where.append(f"{_ci_trim_expr(install_cols, svc_col)} = UPPER(?)")
+        slots.append("eng")
 
-    return (" WHERE " + " AND ".join(where)) if where else "", params
+    return tuple(where), tuple(slots)
 
 
-def _wsr_scope_where(wsr_cols):
-    role = (session.get("role") or "").strip().lower()
-    zone = (session.get("zone") or "").strip()
-    eng  = (session.get("engineer") or "").strip()
+def _installbase_scope_where(install_cols) -> WhereBuilder:
+    role, zone, eng = _session_scope()
+    parts, slots = _installbase_scope_sql(tuple(install_cols), _role_kind(role), bool(zone), bool(eng))
+    return WhereBuilder(parts, _scope_params(slots, zone, eng))
 
-    if role == "admin":
-        return "", []
+
+@lru_cache(maxsize=64)
+def _wsr_scope_sql(wsr_cols: tuple, kind: str, has_zone: bool, has_eng: bool):
+    if kind == "admin":
+        return (), ()
 
     zone_col = _find_col(wsr_cols, aliases=["Zone","ZONE"], must_contain=["zone"])
     eng_col  = _find_col(wsr_cols, aliases=["EngineerName","Engineer Name","ENGINEER_NAME"], must_contain=["engineer","name"])
 
     where = []
-    params = []
+    slots = []
+
+    if has_zone and zone_col:
+        where.append(f"{_ci_trim_expr(wsr_cols, zone_col)} = UPPER(?)")
+        slots.append("zone")
+
+    if kind != "manager" and has_eng and eng_col:
+        where.append(f"{_ci_trim_expr(wsr_cols, eng_col)} = UPPER(?)")
+        slots.append("eng")
 
-    if zone and zone_col:
-        where.append(f"{_cmp_ci_trim(zone_col)} = UPPER(?)")
-        params.append(zone)
+    return tuple(where), tuple(slots)
 
-    if (not _is_manager_like(role)) and eng and eng_col:
-        where.append(f"{_cmp_ci_trim(eng_col)} = UPPER(?)")
-        params.append(eng)
 
-    return (" WHERE " + " AND ".join(where)) if where else "", params
+def _wsr_scope_where(wsr_cols) -> WhereBuilder:
+    role, zone, eng = _session_scope()
+    parts, slots = _wsr_scope_sql(tuple(wsr_cols), _role_kind(role), bool(zone), bool(eng))
+    return WhereBuilder(parts, _scope_params(slots, zone, eng))
 
 
 # ===================== SEARCH BUILDERS =====================
-def _build_token_search_where(q: str, cols: list, preferred_cols: list):
+_TEXT_TYPES = frozenset({"char", "varchar", "nchar", "nvarchar"})
+
+
+def _search_expr(c: str, col_types=None) -> str:
+    # (n)varchar columns are LIKE-able as-is; a CAST would hide them from any index
+    if col_types and col_types.get(c) in _TEXT_TYPES:
+        return _qcol(c)
+    return f"CAST({_qcol(c)} AS NVARCHAR(MAX))"
+
+
+_TOKEN_BUCKETS = (1, 2, 4, 8)
+
+
+def _like_escape(tok: str) -> str:
+    # user-typed [ % _ are literals, not LIKE wildcards
+    return tok.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]")
+
+
+@lru_cache(maxsize=64)
+def _token_match_sql(exprs: tuple) -> str:
+    """One predicate per token: the searched columns unpivoted through VALUES, a single LIKE ?."""
+    values = ", ".join(f"({e})" for e in exprs)
+    return f"EXISTS (SELECT 1 FROM (VALUES {values}) v(x) WHERE v.x LIKE ?)"
+
+
+# ✅ optional persisted search column, one per table, e.g.
+#   ALTER TABLE dbo.InstallBase ADD SearchBlob AS (CONCAT_WS(N' ', [ZONE], [SERVICE_ENGR],
+#       [Cluster_No], [CUSTOMER_NAME], [Location], [Machine_Type], [Model], [Serial_No])) PERSISTED;
+#   ALTER TABLE dbo.WSR ADD SearchBlob AS (CONCAT_WS(N' ', [Zone], [EngineerName], [CustomerName],
+#       [Location], [MMM-YY], [Serial], [Model], CONVERT(NCHAR(10), [VisitDate], 120))) PERSISTED;
+#   CREATE FULLTEXT INDEX ON dbo.InstallBase (SearchBlob) KEY INDEX PK_InstallBase;  -- optional
+# when present, token search hits that one column instead of unpivoting every preferred
+# column, so it must list every column in the endpoint's `preferred` set
+SEARCH_BLOB_COL = "SearchBlob"
+
+
+def _build_token_search_where(q: str, cols: list, preferred_cols: list, col_types=None,
+                              ft_cols=frozenset(), fulltext: bool = True) -> WhereBuilder:
     q = (q or "").strip()
     if not q:
-        return "", []
+        return WhereBuilder()
 
-    tokens = [t.strip() for t in q.split() if t.strip()]
+    # patterns longer than PARAM_STR_WIDTH bind with pyodbc's default sizing
+    tokens = q.split()
     if not tokens:
-        return "", []
+        return WhereBuilder()
+
+    if not fulltext:
+        ft_cols = frozenset()
+
+    terms = None
+    if SEARCH_BLOB_COL in cols:
+        if SEARCH_BLOB_COL in ft_cols:
+            # every token as a word prefix: '"foo*" AND "bar*"'
+            expr = " AND ".join('"' + t.replace('"', '""') + '*"' for t in dict.fromkeys(tokens))
+            return WhereBuilder([f"CONTAINS({_qcol(SEARCH_BLOB_COL)}, ?)"], [expr])
+        match_sql = f"{_qcol(SEARCH_BLOB_COL)} LIKE ?"
+    else:
+        idx = _col_index(cols)
+        actual_search_cols = []
+        for pc in preferred_cols:
+            k = _norm(pc)
+            if k in idx:
+                actual_search_cols.append(idx[k])
+
+        if not actual_search_cols:
+            # none of the preferred columns exist: fall back to the text columns
+            # only (no NVARCHAR(MAX) cast per row), or the first 30 if types are unknown
+            text_cols = [c for c in cols if col_types.get(c) in _TEXT_TYPES] if col_types else []
+            actual_search_cols = (text_cols or cols)[:30]
+        actual_search_cols = list(dict.fromkeys(actual_search_cols))
+
+        if ft_cols and all(c in ft_cols for c in actual_search_cols):
+            # all searched columns are full-text indexed: one word-prefix
+            # CONTAINS per token over the column list (any column may match)
+            col_list = ", ".join(_qcol(c) for c in actual_search_cols)
+            match_sql = f"CONTAINS(({col_list}), ?)"
+            terms = ['"' + t.replace('"', '""') + '*"' for t in dict.fromkeys(tokens)]
+        else:
+            match_sql = _token_match_sql(tuple(_search_expr(c, col_types) for c in actual_search_cols))
+
+    if terms is None:
+        terms = [f"%{_like_escape(tok)}%" for tok in dict.fromkeys(tokens)]
+
+    # pad the token count up to a bucket so the SQL text (and its cached plan)
+    # is shared across queries; repeating a token AND-ed in is a no-op
+    bucket = next((b for b in _TOKEN_BUCKETS if b >= len(terms)), len(terms))
+    terms += [terms[-1]] * (bucket - len(terms))
+
+    return WhereBuilder([match_sql] * len(terms), terms)
+
+
+def _token_search(q: str, cols, preferred_cols, table: str):
+    """(search WHERE, LIKE-only fallback or None) for a list view.
+
+    The fallback is only built when the search uses full-text CONTAINS, which
+    rejects some terms; the caller reruns the query with it on a SQL error.
+    """
+    col_types, ft_cols = _column_types(table), _fulltext_columns(table)
+    search = _build_token_search_where(q, cols, preferred_cols, col_types, ft_cols)
+    if not any(p.startswith("CONTAINS") for p in search.parts):
+        return search, None
+    return search, _build_token_search_where(q, cols, preferred_cols, col_types, ft_cols, fulltext=False)
+
+
+# ===================== SQL TEMPLATES =====================
+# identifier-only SQL fragments, built once per cached column tuple
+@lru_cache(maxsize=16)
+def _select_list(cols: tuple) -> str:
+    return ", ".join(_qcol(c) for c in cols)
+
+
+@lru_cache(maxsize=16)
+def _display_cols(cols: tuple) -> tuple:
+    """Columns shown in list views: drops helper columns (SearchBlob, "<col>_N" keys)."""
+    names = set(cols)
+    return tuple(
+        c for c in cols
+        if c != SEARCH_BLOB_COL and not (c.endswith("_N") and c[:-2] in names)
+    )
+
+
+# final list-view query text per (schema, filter shape, order): the scope and
+# search parts are themselves cached strings, so after warm-up every request
+# reuses one finished statement instead of re-joining it
+@lru_cache(maxsize=256)
+def _top_select_sql(table: str, view_cols: tuple, where_parts: tuple, order_by: str) -> str:
+    where_sql = (" WHERE " + " AND ".join(where_parts)) if where_parts else ""
+    # TOP (?) keeps one cached plan per filter shape instead of one per limit
+    return f"SELECT TOP (?) {_select_list(view_cols)} FROM {table}{where_sql} ORDER BY {order_by}"
+
+
+def _sel(col, alias):
+    return f"{_qcol(col)} AS {alias}" if col else f"'' AS {alias}"
+
+
+@lru_cache(maxsize=8)
+def _ib_rows_template(cols: tuple):
+    """(cust_col, select_sql, order_by) for /api/installbase/rows, built once per schema."""
+    cust_col = _find_col(cols, aliases=["CUSTOMER_NAME","CUSTOMER NAME","CustomerName","Customer Name"], must_contain=["customer","name"])
+    if not cust_col:
+        return None, "", ""
+
+    zone_col    = _find_col(cols, aliases=["ZONE","Zone"], must_contain=["zone"])
+    svc_col     = _find_col(cols, aliases=["SERVICE_ENGR","SERVICE ENGR"], must_contain=["service","engr"])
+    cluster_col = _find_col(cols, aliases=["Cluster_No","CLUSTER NO","Cluster No"], must_contain=["cluster"])
+    loc_col     = _find_col(cols, aliases=["LOCATION","Location"], must_contain=["location"])
+    state_col   = _find_col(cols, aliases=["STATE","State"], must_contain=["state"])
+    addr_col    = _find_col(cols, aliases=["Address","ADDRESS"], must_contain=["address"])
+    serial_col  = _find_col(cols, aliases=["Serial No.","Serial No","Serial_No","SERIAL NO","SerialNo"], must_contain=["serial"])
+    ink_col     = _find_col(cols, aliases=["Ink type","InkType","INK TYPE"], must_contain=["ink"])
+    active_col  = _find_col(cols, aliases=["Active Status","ActiveStatus"], must_contain=["active","status"])
+    mc_status_col = _find_col(cols, aliases=["Mc Status","McStatus","Machine Status","MachineStatus"], must_contain=["status"])
+
+    # ✅✅ FIX: model + machine type columns for JSON return
+    model_col = _find_col(cols, aliases=["Model","MODEL","Printer Model","PrinterModel"], must_contain=["model"])
+    mtype_col = _find_col(cols, aliases=["Machine Type","MachineType","Machine_Type"], must_contain=["machine","type"])
+
+    cp_col   = _find_col(cols, aliases=["Contact Person","ContactPerson"], must_contain=["contact","person"])
+    des_col  = _find_col(cols, aliases=["Designation"], must_contain=["designation"])
+    cn_col   = _find_col(cols, aliases=["Contact No","ContactNumber","Contact Number"], must_contain=["contact","no"])
+    email_col= _find_col(cols, aliases=["Email","Email Id"], must_contain=["email"])
+
+    select_sql = ", ".join([
+        _sel(cust_col, "customer_name"),
+        _sel(serial_col, "serial_no"),
+        _sel(model_col, "model"),            # ✅ added
+        _sel(mtype_col, "machine_type"),     # ✅ added
+        _sel(zone_col, "zone"),
+        _sel(svc_col, "service_engr"),
+        _sel(cluster_col, "cluster_no"),
+        _sel(loc_col, "location"),
+        _sel(state_col, "state"),
+        _sel(addr_col, "address"),
+        _sel(ink_col, "ink_type"),
+        _sel(active_col, "active_status"),
+        _sel(mc_status_col, "mc_status"),
+        _sel(cp_col, "contact_person"),
+        _sel(des_col, "designation"),
+        _sel(cn_col, "contact_no"),
+        _sel(email_col, "email"),
+    ])
+
+    order_by = f" ORDER BY {(_qcol(serial_col) if serial_col else _qcol(cust_col))}"
+    return cust_col, select_sql, order_by
 
-    idx = _col_index(cols)
-    actual_search_cols = []
-    for pc in preferred_cols:
-        k = _norm(pc)
-        if k in idx:
-            actual_search_cols.append(idx[k])
 
-    if not actual_search_cols:
-        actual_search_cols = cols[:30]
+SUGGEST_LIMIT = 12
+# shorter prefixes match most of the table and can't use an index anyway
+SUGGEST_MIN_LEN = 3
 
+
+@lru_cache(maxsize=128)
+def _suggest_union_template(table: str, key_cols: tuple, scope_parts: tuple, ft_key_cols: frozenset) -> str:
+    """SQL text for _suggest_union_sql; depends only on schema + scope shape, never on q."""
+    base = "".join(p + " AND " for p in scope_parts)
     parts = []
+    for k, c in enumerate(key_cols):
+        if c in ft_key_cols:
+            cond = f"CONTAINS({_qcol(c)}, ?)"
+        else:
+            cond = f"CAST({_qcol(c)} AS NVARCHAR(200)) LIKE ?"
+        parts.append(f"""
+            SELECT v, {k} AS k FROM (
+                SELECT DISTINCT TOP 10 CAST({_qcol(c)} AS NVARCHAR(200)) AS v
+                FROM {table}
+                WHERE {base}{cond}
+                ORDER BY v
+            ) t{k}
+        """)
+
+    return f"""
+        SELECT TOP {SUGGEST_LIMIT} LTRIM(RTRIM(MIN(u.v))) AS v
+        FROM ({" UNION ALL ".join(parts)}) u
+        WHERE LTRIM(RTRIM(u.v)) <> ''
+        GROUP BY LOWER(LTRIM(RTRIM(u.v)))
+        ORDER BY MIN(u.k), MIN(u.v)
+    """
+
+
+def _suggest_union_sql(table: str, key_cols, scope: WhereBuilder, q: str, ft_cols=frozenset()):
+    """One query for a multi-column suggest box: (sql, params), or ("", []) with no columns.
+
+    Each column keeps its own DISTINCT TOP 10 (k = column priority); the
+    outer GROUP BY dedupes case-insensitively on the trimmed value, so the
+    result is already the final, ordered list of at most SUGGEST_LIMIT items.
+    Columns in ft_cols use a full-text word-prefix CONTAINS instead of LIKE '%q%'.
+    """
+    key_cols = tuple(key_cols)
+    if not key_cols:
+        return "", []
+
+    ft_key_cols = frozenset(c for c in key_cols if c in ft_cols)
+    sql = _suggest_union_template(table, key_cols, tuple(scope.parts), ft_key_cols)
+
+    like_term = f"%{_like_escape(q)}%"
+    ft_term = '"' + q.replace('"', '""') + '*"'
     params = []
-    for tok in tokens:
-        ors = []
-        for c in actual_search_cols:
-            ors.append(f"CAST({_qcol(c)} AS NVARCHAR(MAX)) LIKE ?")
-            params.append(f"%{tok}%")
-        parts.append("(" + " OR ".join(ors) + ")")
+    for c in key_cols:
+        params += scope.params
+        params.append(ft_term if c in ft_key_cols else like_term)
+    return sql, params
+
+
+# ✅ optional full-text index for suggest (one-time DDL, e.g. for WSR):
+#   CREATE FULLTEXT CATALOG wsr_ft;
+#   CREATE FULLTEXT INDEX ON dbo.WSR (CustomerName, EngineerName, Zone, [MMM-YY]) KEY INDEX PK_WSR ON wsr_ft;
+# indexed columns are picked up with the schema cache; anything else keeps LIKE
+def _fetch_suggest(table: str, key_cols, scope: WhereBuilder, q: str):
+    ft_cols = _fulltext_columns(table)
+    sql, params = _suggest_union_sql(table, key_cols, scope, q, ft_cols)
+    if not sql:
+        return []
 
-    return "(" + " AND ".join(parts) + ")", params
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            _execute(cur, sql, params)
+        except pyodbc.Error:
+            if not ft_cols:
+                raise
+            # e.g. a search term CONTAINS can't parse: retry the plain LIKE form
+            sql, params = _suggest_union_sql(table, key_cols, scope, q)
+            _execute(cur, sql, params)
+        return [r[0] for r in cur.fetchall()]
 
 
 # ===================== KPI =====================
@@ -313,33 +1107,45 @@ def api_kpi():
     if not install_cols:
         return _json_err("dbo.InstallBase not found", 400)
 
-    where_sql, params = _installbase_scope_where(install_cols)
+    where = _installbase_scope_where(install_cols)
+    where_sql, params = where.sql(), where.params
 
-    try:
+    cache_key = _cache_key("kpi", where_sql, params)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+
+    cust_col = _find_col(
+        install_cols,
+        aliases=["CUSTOMER_NAME","CUSTOMER NAME","CustomerName","Customer Name"],
+        must_contain=["customer","name"]
+    )
+    customers_sql = f"COUNT(DISTINCT {_qcol(cust_col)})" if cust_col else "0"
+
+    # both aggregates in one scan / one round-trip; add future KPIs here as
+    # conditional aggregates (SUM(CASE WHEN ... THEN 1 ELSE 0 END))
+    def load():
         with get_conn() as conn:
             cur = conn.cursor()
-            cur.execute(f"SELECT COUNT(*) FROM dbo.InstallBase{where_sql}", params)
-            installbase_total = int(cur.fetchone()[0])
-
-            cust_col = _find_col(
-                install_cols,
-                aliases=["CUSTOMER_NAME","CUSTOMER NAME","CustomerName","Customer Name"],
-                must_contain=["customer","name"]
-            )
-            customers = 0
-            if cust_col:
-                cur.execute(f"SELECT COUNT(DISTINCT {_qcol(cust_col)}) FROM dbo.InstallBase{where_sql}", params)
-                customers = int(cur.fetchone()[0])
+            _execute(cur, f"SELECT COUNT(*), {customers_sql} FROM dbo.InstallBase{where_sql}", params)
+            return cur.fetchone()
+
+    try:
+        total, customers = _single_flight(cache_key, load)
+        installbase_total = int(total)
+        customers = int(customers)
 
     except Exception as e:
         return _json_err(f"InstallBase KPI error: {e}", 500)
 
-    return jsonify({
+    kpi = {
         "installbase_total": installbase_total,
         "customers": customers,
         "this_month_reports": 0,
         "pending": 0
-    })
+    }
+    _cache_set(cache_key, kpi, KPI_CACHE_TTL)
+    return jsonify(kpi)
 
 
 # ===================== MASTER INSTALLBASE =====================
@@ -356,45 +1162,38 @@ def api_master_installbase():
     if not cols:
         return _json_err("dbo.InstallBase not found", 400)
 
-    base_where, base_params = _installbase_scope_where(cols)
+    scope = _installbase_scope_where(cols)
 
     preferred = [
         "ZONE","SERVICE_ENGR","Cluster_No","CUSTOMER_NAME","Location","Machine_Type","Model","Serial_No",
         "SERVICE ENGR","CLUSTER NO","CUSTOMER NAME","SERIAL NO"
     ]
-    search_where, search_params = _build_token_search_where(q, cols, preferred)
+    search, like_search = _token_search(q, cols, preferred, "dbo.InstallBase")
+    page = WhereBuilder()
 
-    where_parts = []
-    params = []
-    if base_where:
-        where_parts.append(base_where.replace(" WHERE ", "", 1))
-        params += base_params
-    if search_where:
-        where_parts.append(search_where)
-        params += search_params
+    id_col = _find_col(cols, aliases=["Id","ID"], must_contain=["id"])
 
-    where_sql = (" WHERE " + " AND ".join(where_parts)) if where_parts else ""
+    # keyset paging: ?after_id=<last Id of previous page> (needs an Id column)
+    after_id = (request.args.get("after_id") or "").strip()
+    if after_id and not after_id.isdigit():
+        return _json_err("bad after_id", 400)
+    if after_id and id_col:
+        page.add(f"{_qcol(id_col)} < ?", int(after_id))
 
-    id_col = _find_col(cols, aliases=["Id","ID"], must_contain=["id"])
     order_by = f"{_qcol(id_col)} DESC" if id_col else f"{_qcol(cols[0])} DESC"
-    select_cols = ", ".join([_qcol(c) for c in cols])
+    view_cols = _display_cols(cols)
 
-    sql = f"SELECT TOP {limit} {select_cols} FROM dbo.InstallBase{where_sql} ORDER BY {order_by}"
+    def statement(search):
+        where = scope.copy().merge(search).merge(page)
+        return _top_select_sql("dbo.InstallBase", view_cols, tuple(where.parts), order_by), [limit, *where.params]
 
-    try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            rows = cur.fetchall()
+    sql, params = statement(search)
+    fallback = statement(like_search) if like_search is not None else None
 
-        out_rows = []
-        for r in rows:
-            obj = {}
-            for i, c in enumerate(cols):
-                obj[c] = _json_safe(r[i])
-            out_rows.append(obj)
+    page_keys = {"next_after_id": view_cols.index(id_col)} if id_col else None
 
-        return jsonify({"columns": cols, "rows": out_rows})
+    try:
+        return _stream_rows(sql, params, view_cols, limit, page_keys, fallback=fallback)
 
     except Exception as e:
         return _json_err(f"InstallBase API error: {e}", 500)
@@ -403,17 +1202,22 @@ def api_master_installbase():
 @app.get("/api/master/installbase/suggest")
 def api_master_installbase_suggest():
     need = _require_login_json()
-    if need: return jsonify({"items": []}), 401
+    if need: return _empty_items(401)
 
     q = (request.args.get("q") or "").strip()
-    if len(q) < 2:
-        return jsonify({"items": []})
+    if len(q) < SUGGEST_MIN_LEN:
+        return _empty_items()
 
     cols = _table_columns("dbo.InstallBase")
     if not cols:
-        return jsonify({"items": []})
+        return _empty_items()
+
+    scope = _installbase_scope_where(cols)
 
-    base_where, base_params = _installbase_scope_where(cols)
+    cache_key = _cache_key("sugg:ib_master", scope.sql(), scope.params, q)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return jsonify({"items": cached})
 
     zone_col   = _find_col(cols, aliases=["ZONE","Zone"], must_contain=["zone"])
     svc_col    = _find_col(cols, aliases=["SERVICE_ENGR","SERVICE ENGR"], must_contain=["service","engr"])
@@ -422,67 +1226,75 @@ def api_master_installbase_suggest():
     cluster_col= _find_col(cols, aliases=["Cluster_No","CLUSTER NO","Cluster No"], must_contain=["cluster"])
     loc_col    = _find_col(cols, aliases=["LOCATION","Location"], must_contain=["location"])
 
-    items = []
-    seen = set()
-
     key_cols = [c for c in [cust_col, serial_col, loc_col, svc_col, zone_col, cluster_col] if c]
 
     try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-
-            for c in key_cols:
-                where_parts = []
-                params = []
-
-                if base_where:
-                    where_parts.append(base_where.replace(" WHERE ", "", 1))
-                    params += base_params
-
-                where_parts.append(f"CAST({_qcol(c)} AS NVARCHAR(200)) LIKE ?")
-                params.append(f"%{q}%")
-
-                where_sql = " WHERE " + " AND ".join(where_parts) if where_parts else ""
-                sql = f"""
-                    SELECT DISTINCT TOP 10 CAST({_qcol(c)} AS NVARCHAR(200)) AS v
-                    FROM dbo.InstallBase
-                    {where_sql}
-                    ORDER BY v
-                """
-                cur.execute(sql, params)
-
-                for (v,) in cur.fetchall():
-                    vv = (v or "").strip()
-                    if not vv:
-                        continue
-                    k = vv.lower()
-                    if k in seen:
-                        continue
-                    seen.add(k)
-                    items.append(vv)
-                    if len(items) >= 12:
-                        break
-
-                if len(items) >= 12:
-                    break
+        items = _single_flight(cache_key, lambda: _fetch_suggest("dbo.InstallBase", key_cols, scope, q))
 
     except Exception:
-        return jsonify({"items": []})
+        return _empty_items()
 
+    _cache_set(cache_key, items, SUGGEST_CACHE_TTL)
     return jsonify({"items": items})
 
 
 # ===================== INSTALLBASE SUGGESTS =====================
+# ===================== INSTALLBASE FORM SUGGEST =====================
+COL_SUGGEST_LIMIT = 30
+
+
+def _fetch_col_suggest(col: str, col_types, ft_cols, scope: WhereBuilder, q: str):
+    """DISTINCT values of one dbo.InstallBase column for the form datalists.
+
+    A typed value is matched as a prefix first ('q%' can seek an index on the
+    column); only when that leaves the list short is it topped up with
+    substring matches: a word-prefix CONTAINS when the column is full-text
+    indexed, '%q%' otherwise. An empty q lists the first values.
+    """
+    expr = _qcol(col) if col_types.get(col) in _TEXT_TYPES else f"CAST({_qcol(col)} AS NVARCHAR(200))"
+
+    def sql(where):
+        return f"SELECT DISTINCT TOP {COL_SUGGEST_LIMIT} {expr} AS v FROM dbo.InstallBase{where.sql()} ORDER BY v"
+
+    passes = [scope]
+    fallback = None
+    if q:
+        pat = _like_escape(q)
+        like_pass = scope.copy().add(f"{expr} LIKE ?", f"%{pat}%")
+        passes = [scope.copy().add(f"{expr} LIKE ?", f"{pat}%"), like_pass]
+        if col in ft_cols:
+            passes[1] = scope.copy().add(f"CONTAINS({_qcol(col)}, ?)", '"' + q.replace('"', '""') + '*"')
+            fallback = like_pass
+
+    items = []
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for where in passes:
+            try:
+                _execute(cur, sql(where), where.params)
+            except pyodbc.Error:
+                if fallback is None or where is not passes[-1]:
+                    raise
+                # a term CONTAINS can't parse: use the plain LIKE form
+                _execute(cur, sql(fallback), fallback.params)
+            items.extend(x for x in ((r[0] or "").strip() for r in cur.fetchall()) if x)
+            if len(items) >= COL_SUGGEST_LIMIT:
+                break
+    return list(dict.fromkeys(items))[:COL_SUGGEST_LIMIT]
+
+
 @app.get("/api/installbase/customer_suggest")
 def api_installbase_customer_suggest():
     need = _require_login_json()
-    if need: return jsonify({"items": []}), 401
+    if need: return _empty_items(401)
 
     q = (request.args.get("q") or "").strip()
+    if q and len(q) < SUGGEST_MIN_LEN:
+        return _empty_items()
 
     cols = _table_columns("dbo.InstallBase")
     if not cols:
-        return jsonify({"items": []})
+        return _empty_items()
 
     cust_col = _find_col(
         cols,
@@ -490,182 +1302,86 @@ def api_installbase_customer_suggest():
         must_contain=["customer", "name"]
     )
     if not cust_col:
-        return jsonify({"items": []})
+        return _empty_items()
 
-    base_where, base_params = _installbase_scope_where(cols)
+    where = _installbase_scope_where(cols)
 
-    where_parts = []
-    params = []
-    if base_where:
-        where_parts.append(base_where.replace(" WHERE ", "", 1))
-        params += base_params
-
-    if q:
-        where_parts.append(f"CAST({_qcol(cust_col)} AS NVARCHAR(200)) LIKE ?")
-        params.append(f"%{q}%")
-
-    where_sql = " WHERE " + " AND ".join(where_parts) if where_parts else ""
+    cache_key = _cache_key("sugg:ib_customer", where.sql(), where.params, q)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return jsonify({"items": cached})
 
-    sql = f"""
-        SELECT DISTINCT TOP 30 CAST({_qcol(cust_col)} AS NVARCHAR(200)) AS v
-        FROM dbo.InstallBase
-        {where_sql}
-        ORDER BY v
-    """
     try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            items = [(r[0] or "").strip() for r in cur.fetchall()]
-            items = [x for x in items if x]
+        items = _single_flight(cache_key, lambda: _fetch_col_suggest(
+            cust_col, _column_types("dbo.InstallBase"), _fulltext_columns("dbo.InstallBase"), where, q))
+        _cache_set(cache_key, items, SUGGEST_CACHE_TTL)
         return jsonify({"items": items})
     except Exception:
-        return jsonify({"items": []})
+        return _empty_items()
 
 
 @app.get("/api/installbase/serial_suggest")
 def api_installbase_serial_suggest():
     need = _require_login_json()
-    if need: return jsonify({"items": []}), 401
+    if need: return _empty_items(401)
 
     q = (request.args.get("q") or "").strip()
+    if q and len(q) < SUGGEST_MIN_LEN:
+        return _empty_items()
 
     cols = _table_columns("dbo.InstallBase")
     if not cols:
-        return jsonify({"items": []})
+        return _empty_items()
 
     serial_col = _find_col(cols, aliases=["Serial No.","Serial No","Serial_No","SERIAL NO","SerialNo"], must_contain=["serial"])
     if not serial_col:
-        return jsonify({"items": []})
-
-    base_where, base_params = _installbase_scope_where(cols)
+        return _empty_items()
 
-    where_parts = []
-    params = []
-    if base_where:
-        where_parts.append(base_where.replace(" WHERE ", "", 1))
-        params += base_params
-
-    if q:
-        where_parts.append(f"CAST({_qcol(serial_col)} AS NVARCHAR(200)) LIKE ?")
-        params.append(f"%{q}%")
+    where = _installbase_scope_where(cols)
 
-    where_sql = " WHERE " + " AND ".join(where_parts) if where_parts else ""
+    cache_key = _cache_key("sugg:ib_serial", where.sql(), where.params, q)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return jsonify({"items": cached})
 
-    sql = f"""
-        SELECT DISTINCT TOP 30 CAST({_qcol(serial_col)} AS NVARCHAR(200)) AS v
-        FROM dbo.InstallBase
-        {where_sql}
-        ORDER BY v
-    """
     try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            items = [(r[0] or "").strip() for r in cur.fetchall()]
-            items = [x for x in items if x]
+        items = _single_flight(cache_key, lambda: _fetch_col_suggest(
+            serial_col, _column_types("dbo.InstallBase"), _fulltext_columns("dbo.InstallBase"), where, q))
+        _cache_set(cache_key, items, SUGGEST_CACHE_TTL)
         return jsonify({"items": items})
     except Exception:
-        return jsonify({"items": []})
+        return _empty_items()
 
 
 @app.get("/api/installbase/rows")
 def api_installbase_rows():
     need = _require_login_json()
-    if need: return jsonify({"ok": False, "rows": []}), 401
+    if need: return _json_bytes(_NO_ROWS_BODY, 401)
 
     customer = (request.args.get("customer") or "").strip()
     if not customer:
-        return jsonify({"ok": True, "rows": []})
+        return _json_bytes(_EMPTY_ROWS_BODY)
 
     cols = _table_columns("dbo.InstallBase")
     if not cols:
         return jsonify({"ok": False, "rows": [], "message": "dbo.InstallBase not found"}), 400
 
-    cust_col = _find_col(cols, aliases=["CUSTOMER_NAME","CUSTOMER NAME","CustomerName","Customer Name"], must_contain=["customer","name"])
+    cust_col, select_sql, order_by = _ib_rows_template(cols)
     if not cust_col:
         return jsonify({"ok": False, "rows": [], "message": "Customer column not found"}), 400
 
-    zone_col    = _find_col(cols, aliases=["ZONE","Zone"], must_contain=["zone"])
-    svc_col     = _find_col(cols, aliases=["SERVICE_ENGR","SERVICE ENGR"], must_contain=["service","engr"])
-    cluster_col = _find_col(cols, aliases=["Cluster_No","CLUSTER NO","Cluster No"], must_contain=["cluster"])
-    loc_col     = _find_col(cols, aliases=["LOCATION","Location"], must_contain=["location"])
-    state_col   = _find_col(cols, aliases=["STATE","State"], must_contain=["state"])
-    addr_col    = _find_col(cols, aliases=["Address","ADDRESS"], must_contain=["address"])
-    serial_col  = _find_col(cols, aliases=["Serial No.","Serial No","Serial_No","SERIAL NO","SerialNo"], must_contain=["serial"])
-    ink_col     = _find_col(cols, aliases=["Ink type","InkType","INK TYPE"], must_contain=["ink"])
-    active_col  = _find_col(cols, aliases=["Active Status","ActiveStatus"], must_contain=["active","status"])
-    mc_status_col = _find_col(cols, aliases=["Mc Status","McStatus","Machine Status","MachineStatus"], must_contain=["status"])
-
-    # ✅✅ FIX: model + machine type columns for JSON return
-    model_col = _find_col(cols, aliases=["Model","MODEL","Printer Model","PrinterModel"], must_contain=["model"])
-    mtype_col = _find_col(cols, aliases=["Machine Type","MachineType","Machine_Type"], must_contain=["machine","type"])
-
-    cp_col   = _find_col(cols, aliases=["Contact Person","ContactPerson"], must_contain=["contact","person"])
-    des_col  = _find_col(cols, aliases=["Designation"], must_contain=["designation"])
-    cn_col   = _find_col(cols, aliases=["Contact No","ContactNumber","Contact Number"], must_contain=["contact","no"])
-    email_col= _find_col(cols, aliases=["Email","Email Id"], must_contain=["email"])
-
-    base_where, base_params = _installbase_scope_where(cols)
-
-    where_parts = []
-    params = []
-    if base_where:
-        where_parts.append(base_where.replace(" WHERE ", "", 1))
-        params += base_params
-
-    where_parts.append(f"{_cmp_ci_trim(cust_col)} = UPPER(?)")
-    params.append(customer)
-
-    where_sql = " WHERE " + " AND ".join(where_parts)
-
-    def sel(col, alias):
-        return f"{_qcol(col)} AS {alias}" if col else f"'' AS {alias}"
-
-    select_sql = ", ".join([
-        sel(cust_col, "customer_name"),
-        sel(serial_col, "serial_no"),
-        sel(model_col, "model"),            # ✅ added
-        sel(mtype_col, "machine_type"),     # ✅ added
-        sel(zone_col, "zone"),
-        sel(svc_col, "service_engr"),
-        sel(cluster_col, "cluster_no"),
-        sel(loc_col, "location"),
-        sel(state_col, "state"),
-        sel(addr_col, "address"),
-        sel(ink_col, "ink_type"),
-        sel(active_col, "active_status"),
-        sel(mc_status_col, "mc_status"),
-        sel(cp_col, "contact_person"),
-        sel(des_col, "designation"),
-        sel(cn_col, "contact_no"),
-        sel(email_col, "email"),
-    ])
-
-    order_by = f" ORDER BY {(_qcol(serial_col) if serial_col else _qcol(cust_col))}"
+    where = _installbase_scope_where(cols)
+    where.add(f"{_ci_trim_expr(cols, cust_col)} = UPPER(?)", customer)
 
     sql = f"""
         SELECT TOP (500) {select_sql}
         FROM dbo.InstallBase
-        {where_sql}
+        {where.sql()}
         {order_by}
     """
 
     try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            data_cols = [d[0] for d in cur.description]
-            fetched = cur.fetchall()
-
-        out_rows = []
-        for r in fetched:
-            obj = {}
-            for i, c in enumerate(data_cols):
-                obj[c] = _json_safe(r[i])
-            out_rows.append(obj)
-
-        return jsonify({"ok": True, "rows": out_rows})
+        return _stream_rows(sql, where.params, None, 500, head={"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "rows": [], "message": str(e)}), 500
 
@@ -684,43 +1400,58 @@ def api_report():
     if not cols:
         return jsonify({"columns": [], "rows": []})
 
-    base_where, base_params = _wsr_scope_where(cols)
+    scope = _wsr_scope_where(cols)
 
     preferred = ["Zone","EngineerName","CustomerName","Location","MMM-YY","Serial","Model","VisitDate"]
-    search_where, search_params = _build_token_search_where(q, cols, preferred)
-
-    where_parts = []
-    params = []
-    if base_where:
-        where_parts.append(base_where.replace(" WHERE ", "", 1))
-        params += base_params
-    if search_where:
-        where_parts.append(search_where)
-        params += search_params
-
-    where_sql = (" WHERE " + " AND ".join(where_parts)) if where_parts else ""
+    search, like_search = _token_search(q, cols, preferred, "dbo.WSR")
+    page = WhereBuilder()
 
     visit_col = _find_col(cols, aliases=["VisitDate","Visit Date"], must_contain=["visit","date"])
     id_col    = _find_col(cols, aliases=["Id","ID"], must_contain=["id"])
-    order_by = f"{_qcol(visit_col)} DESC" if visit_col else (f"{_qcol(id_col)} DESC" if id_col else f"{_qcol(cols[0])} DESC")
 
-    select_cols = ", ".join([_qcol(c) for c in cols])
-    sql = f"SELECT TOP {limit} {select_cols} FROM dbo.WSR{where_sql} ORDER BY {order_by}"
+    view_cols = _display_cols(cols)
+    page_keys = None
+    if id_col:
+        # keyset paging on (VisitDate, Id); NULL visit dates sort last under DESC
+        after_id = (request.args.get("after_id") or "").strip()
+        if after_id and not after_id.isdigit():
+            return _json_err("bad after_id", 400)
+        after_id = int(after_id) if after_id else after_id
+        if visit_col:
+            order_by = f"{_qcol(visit_col)} DESC, {_qcol(id_col)} DESC"
+            page_keys = {"next_after_visit": view_cols.index(visit_col), "next_after_id": view_cols.index(id_col)}
+            if after_id:
+                after_visit = (request.args.get("after_visit") or "").strip()
+                try:
+                    # bind as a datetime so 6-digit fractions don't trip DATETIME conversion
+                    after_visit = datetime.fromisoformat(after_visit) if after_visit else after_visit
+                except ValueError:
+                    return _json_err("bad after_visit", 400)
+                if after_visit:
+                    page.add(
+                        f"({_qcol(visit_col)} < ? OR ({_qcol(visit_col)} = ? AND {_qcol(id_col)} < ?)"
+                        f" OR {_qcol(visit_col)} IS NULL)",
+                        after_visit, after_visit, after_id
+                    )
+                else:
+                    page.add(f"({_qcol(visit_col)} IS NULL AND {_qcol(id_col)} < ?)", after_id)
+        else:
+            order_by = f"{_qcol(id_col)} DESC"
+            page_keys = {"next_after_id": view_cols.index(id_col)}
+            if after_id:
+                page.add(f"{_qcol(id_col)} < ?", after_id)
+    else:
+        order_by = f"{_qcol(visit_col)} DESC" if visit_col else f"{_qcol(cols[0])} DESC"
 
-    try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(sql, params)
-            rows = cur.fetchall()
+    def statement(search):
+        where = scope.copy().merge(search).merge(page)
+        return _top_select_sql("dbo.WSR", view_cols, tuple(where.parts), order_by), [limit, *where.params]
 
-        out_rows = []
-        for r in rows:
-            obj = {}
-            for i, c in enumerate(cols):
-                obj[c] = _json_safe(r[i])
-            out_rows.append(obj)
+    sql, params = statement(search)
+    fallback = statement(like_search) if like_search is not None else None
 
-        return jsonify({"columns": cols, "rows": out_rows})
+    try:
+        return _stream_rows(sql, params, view_cols, limit, page_keys, fallback=fallback)
 
     except Exception as e:
         return _json_err(str(e), 500)
@@ -729,17 +1460,22 @@ def api_report():
 @app.get("/api/report/suggest")
 def api_report_suggest():
     need = _require_login_json()
-    if need: return jsonify({"items": []}), 401
+    if need: return _empty_items(401)
 
     q = (request.args.get("q") or "").strip()
-    if len(q) < 2:
-        return jsonify({"items": []})
+    if len(q) < SUGGEST_MIN_LEN:
+        return _empty_items()
 
     cols = _table_columns("dbo.WSR")
     if not cols:
-        return jsonify({"items": []})
+        return _empty_items()
+
+    scope = _wsr_scope_where(cols)
 
-    base_where, base_params = _wsr_scope_where(cols)
+    cache_key = _cache_key("sugg:wsr", scope.sql(), scope.params, q)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return jsonify({"items": cached})
 
     zone_col  = _find_col(cols, aliases=["Zone","ZONE"], must_contain=["zone"])
     eng_col   = _find_col(cols, aliases=["EngineerName","Engineer Name"], must_contain=["engineer","name"])
@@ -748,55 +1484,71 @@ def api_report_suggest():
 
     key_cols = [c for c in [month_col, cust_col, eng_col, zone_col] if c]
 
-    items = []
-    seen = set()
-
     try:
-        with get_conn() as conn:
-            cur = conn.cursor()
-
-            for c in key_cols:
-                where_parts = []
-                params = []
-
-                if base_where:
-                    where_parts.append(base_where.replace(" WHERE ", "", 1))
-                    params += base_params
-
-                where_parts.append(f"CAST({_qcol(c)} AS NVARCHAR(200)) LIKE ?")
-                params.append(f"%{q}%")
-
-                where_sql = " WHERE " + " AND ".join(where_parts) if where_parts else ""
-                sql = f"""
-                    SELECT DISTINCT TOP 10 CAST({_qcol(c)} AS NVARCHAR(200)) AS v
-                    FROM dbo.WSR
-                    {where_sql}
-                    ORDER BY v
-                """
-                cur.execute(sql, params)
-
-                for (v,) in cur.fetchall():
-                    vv = (v or "").strip()
-                    if not vv:
-                        continue
-                    k = vv.lower()
-                    if k in seen:
-                        continue
-                    seen.add(k)
-                    items.append(vv)
-                    if len(items) >= 12:
-                        break
-
-                if len(items) >= 12:
-                    break
+        items = _single_flight(cache_key, lambda: _fetch_suggest("dbo.WSR", key_cols, scope, q))
 
     except Exception:
-        return jsonify({"items": []})
+        return _empty_items()
 
+    _cache_set(cache_key, items, SUGGEST_CACHE_TTL)
     return jsonify({"items": items})
 
 
 
+def _detail_value(v):
+    # dates only (no time part) for the details panel
+    if isinstance(v, datetime):
+        return v.date().isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    return "" if v is None else str(v)
+
+
+_WSR_DETAIL_KEYS = ("last_visit_date", "tot", "pot", "ink", "solvent", "cnc")
+_IB_DETAIL_KEYS = ("filter_due", "amc_due")
+
+
+def _detail_select(fields):
+    """(", [col] AS key, ...", kept keys) for the (column, key) pairs whose column exists."""
+    kept = [(c, k) for c, k in fields if c]
+    return "".join(f", {_qcol(c)} AS {k}" for c, k in kept), tuple(k for _, k in kept)
+
+
+def _fetch_details(sides):
+    """Run every (alias, TOP 1 subquery, params, keys) side in one round trip.
+
+    Each side is an OUTER APPLY off a single dummy row and carries a leading
+    "1 AS hit" column, so a miss on one table leaves the others intact.
+    Returns one {key: value} dict per side ({} when it matched nothing).
+    """
+    if not sides:
+        return []
+
+    outer = []
+    params = []
+    applies = []
+    for alias, sub_sql, sub_params, keys in sides:
+        outer.append(f"{alias}.hit")
+        outer.extend(f"{alias}.{k}" for k in keys)
+        applies.append(f"OUTER APPLY ({sub_sql}) {alias}")
+        params.extend(sub_params)
+
+    sql = f"SELECT {', '.join(outer)} FROM (SELECT 1 AS one) d " + " ".join(applies)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        _execute(cur, sql, params)
+        r = cur.fetchone()
+
+    out = []
+    i = 0
+    for _, _, _, keys in sides:
+        hit = r[i] if r else None
+        vals = r[i + 1:i + 1 + len(keys)] if r else ()
+        out.append(dict(zip(keys, map(_detail_value, vals))) if hit else {})
+        i += 1 + len(keys)
+    return out
+
+
 @app.get("/api/serial/details")
 def api_serial_details():
     need = _require_login_json()
@@ -807,9 +1559,13 @@ def api_serial_details():
     if not serial:
         return jsonify({"ok": True, "wsr": {}, "installbase": {}})
 
+    # both lookups are built here (they need the session scope) and then sent
+    # together as OUTER APPLY subqueries: one connection, one round trip
+    wsr_query = None
+    ib_query = None
+
     # ---------------- WSR: latest row for this serial ----------------
     wsr_cols = _table_columns("dbo.WSR")
-    wsr_data = {}
 
     if wsr_cols:
         wsr_serial_col = _find_col(
@@ -830,59 +1586,19 @@ def api_serial_details():
         wsr_sol_col = _find_col(wsr_cols, aliases=["Solvent", "SOLVENT"], must_contain=["solvent"])
         wsr_cnc_col = _find_col(wsr_cols, aliases=["CNC"], must_contain=["cnc"])
 
-        base_where, base_params = _wsr_scope_where(wsr_cols)
-
         if wsr_serial_col and wsr_visit_col:
-            where_parts = []
-            params = []
-
-            if base_where:
-                where_parts.append(base_where.replace(" WHERE ", "", 1))
-                params += base_params
-
-            where_parts.append(f"{_cmp_ci_trim(wsr_serial_col)} = UPPER(?)")
-            params.append(serial)
-
-            where_sql = " WHERE " + " AND ".join(where_parts)
-
-            def sel(col, alias):
-                return f"{_qcol(col)} AS {alias}" if col else f"'' AS {alias}"
-
-            select_sql = ", ".join([
-                sel(wsr_visit_col, "last_visit_date"),
-                sel(wsr_tot_col, "tot"),
-                sel(wsr_pot_col, "pot"),
-                sel(wsr_ink_col, "ink"),
-                sel(wsr_sol_col, "solvent"),
-                sel(wsr_cnc_col, "cnc"),
-            ])
+            where = _wsr_scope_where(wsr_cols)
+            where.add(f"{_ci_trim_expr(wsr_cols, wsr_serial_col)} = UPPER(?)", serial)
 
-            sql = f"""
-                SELECT TOP 1 {select_sql}
-                FROM dbo.WSR
-                {where_sql}
-                ORDER BY {_qcol(wsr_visit_col)} DESC
-            """
-
-            try:
-                with get_conn() as conn:
-                    cur = conn.cursor()
-                    cur.execute(sql, params)
-                    r = cur.fetchone()
-                    if r:
-                        keys = ["last_visit_date", "tot", "pot", "ink", "solvent", "cnc"]
-                        for i, k in enumerate(keys):
-                            v = r[i]
-                            if isinstance(v, (datetime, date)):
-                                wsr_data[k] = v.date().isoformat() if isinstance(v, datetime) else v.isoformat()
-                            else:
-                                wsr_data[k] = "" if v is None else str(v)
-            except Exception:
-                wsr_data = {}
+            select_sql, keys = _detail_select(zip(
+                (wsr_visit_col, wsr_tot_col, wsr_pot_col, wsr_ink_col, wsr_sol_col, wsr_cnc_col),
+                _WSR_DETAIL_KEYS,
+            ))
+            sql = f"SELECT TOP 1 1 AS hit{select_sql} FROM dbo.WSR{where.sql()} ORDER BY {_qcol(wsr_visit_col)} DESC"
+            wsr_query = ("w", sql, where.params, keys)
 
     # ---------------- InstallBase: dates for this serial ----------------
     ib_cols = _table_columns("dbo.InstallBase")
-    ib_data = {}
 
     if ib_cols:
         ib_serial_col = _find_col(
@@ -903,50 +1619,37 @@ def api_serial_details():
             must_contain=["amc", "due"]
         )
 
-        base_where, base_params = _installbase_scope_where(ib_cols)
-
         if ib_serial_col:
-            where_parts = []
-            params = []
-
-            if base_where:
-                where_parts.append(base_where.replace(" WHERE ", "", 1))
-                params += base_params
-
-            where_parts.append(f"{_cmp_ci_trim(ib_serial_col)} = UPPER(?)")
-            params.append(serial)
+            where = _installbase_scope_where(ib_cols)
+            where.add(f"{_ci_trim_expr(ib_cols, ib_serial_col)} = UPPER(?)", serial)
 
-            where_sql = " WHERE " + " AND ".join(where_parts)
+            select_sql, keys = _detail_select(zip((filter_due_col, amc_due_col), _IB_DETAIL_KEYS))
+            sql = f"SELECT TOP 1 1 AS hit{select_sql} FROM dbo.InstallBase{where.sql()}"
+            ib_query = ("i", sql, where.params, keys)
 
-            def sel(col, alias):
-                return f"{_qcol(col)} AS {alias}" if col else f"'' AS {alias}"
+    # only the slow-changing InstallBase dates are cached (per scope + serial);
+    # the WSR side is read every time so a report just posted shows up at once
+    ib_key = _cache_key("serial_ib", ib_query[1], ib_query[2]) if ib_query else None
+    ib_data = _cache_get(ib_key) if ib_key else {}
 
-            select_sql = ", ".join([
-                sel(filter_due_col, "filter_due"),
-                sel(amc_due_col, "amc_due"),
-            ])
+    sides = [q for q in (wsr_query, ib_query if ib_data is None else None) if q]
+    try:
+        results = dict(zip((q[0] for q in sides), _fetch_details(sides)))
+    except Exception:
+        results = None
 
-            sql = f"""
-                SELECT TOP 1 {select_sql}
-                FROM dbo.InstallBase
-                {where_sql}
-            """
+    wsr_data = (results or {}).get("w", {})
+    if ib_data is None:
+        ib_data = (results or {}).get("i", {})
+        if results is not None:
+            _cache_set(ib_key, ib_data, DETAILS_CACHE_TTL)
 
-            try:
-                with get_conn() as conn:
-                    cur = conn.cursor()
-                    cur.execute(sql, params)
-                    r = cur.fetchone()
-                    if r:
-                        keys = ["filter_due", "amc_due"]
-                        for i, k in enumerate(keys):
-                            v = r[i]
-                            if isinstance(v, (datetime, date)):
-                                ib_data[k] = v.date().isoformat() if isinstance(v, datetime) else v.isoformat()
-                            else:
-                                ib_data[k] = "" if v is None else str(v)
-            except Exception:
-                ib_data = {}
+    # columns missing from the table were left out of the SELECT; they still
+    # come back as "" on a hit, as before
+    if wsr_data:
+        wsr_data = {**dict.fromkeys(_WSR_DETAIL_KEYS, ""), **wsr_data}
+    if ib_data:
+        ib_data = {**dict.fromkeys(_IB_DETAIL_KEYS, ""), **ib_data}
 
     return jsonify({
         "ok": True,
@@ -957,40 +1660,66 @@ def api_serial_details():
 
 
 # ===================== WSR INSERT =====================
+_NA_STRINGS = frozenset({"NA", "N/A", "NULL", "#VALUE!"})
+
+# accepted formats, same as the old strptime chain:
+# %Y-%m-%d | %d-%b-%y | %d-%b-%Y | %d-%m-%Y (day/month may be 1 or 2 digits)
+_DATE_RE = re.compile(
+    r"(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"|(\d{1,2})-([A-Za-z]{3})-(\d{4}|\d{2})"
+    r"|(\d{1,2})-(\d{1,2})-(\d{4})",
+    re.ASCII,
+)
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+
 def _parse_date(v):
     if v is None:
         return None
-    s = str(v).strip()
-    if not s or s.upper() in ("NA", "N/A", "NULL", "#VALUE!"):
+    s = (v if type(v) is str else str(v)).strip()
+    if not s or s.upper() in _NA_STRINGS:
+        return None
+
+    m = _DATE_RE.fullmatch(s)
+    if not m:
+        return None
+    y1, m1, d1, d2, mon, y2, d3, m3, y3 = m.groups()
+    try:
+        if y1:
+            return date(int(y1), int(m1), int(d1))
+        if mon:
+            month = _MONTHS.get(mon.lower())
+            if not month:
+                return None
+            y = int(y2)
+            if len(y2) == 2:
+                # strptime %y pivot: 69-99 => 19xx, 00-68 => 20xx
+                y += 1900 if y >= 69 else 2000
+            return date(y, month, int(d2))
+        return date(int(y3), int(m3), int(d3))
+    except ValueError:
         return None
-    for fmt in ("%Y-%m-%d", "%d-%b-%y", "%d-%b-%Y", "%d-%m-%Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except Exception:
-            pass
-    return None
 
 
 # ✅ time helper: keep HH:MM as text
 def _parse_time_hhmm(v):
     if v is None:
         return None
-    s = str(v).strip()
-    if not s or s.upper() in ("NA", "N/A", "NULL", "#VALUE!"):
+    s = (v if type(v) is str else str(v)).strip()
+    if not s or s.upper() in _NA_STRINGS:
         return None
     return s[:5]
 
 
-@app.post("/api/wsr")
-def api_wsr():
-    if "user" not in session:
-        return jsonify({"ok": False, "message": "Unauthorized"}), 401
-
-    payload = request.get_json(force=True) or {}
-    cols = _table_columns("dbo.WSR")
-    if not cols:
-        return jsonify({"ok": False, "message": "dbo.WSR table not found"}), 400
+@lru_cache(maxsize=8)
+def _wsr_insert_plan(cols: tuple):
+    """(insert_sql, fields) for /api/wsr, built once per schema.
 
+    fields is a tuple of (payload key, converter) in placeholder order, where
+    converter is _parse_date, _parse_time_hhmm or None (value passed as-is);
+    insert_sql is "" when no payload key maps to a dbo.WSR column.
+    """
     zone_col = _find_col(cols, aliases=["Zone","ZONE"], must_contain=["zone"])
     eng_col  = _find_col(cols, aliases=["EngineerName","Engineer Name"], must_contain=["engineer","name"])
     month_col= _find_col(cols, aliases=["MonthYear","MMM-YY","MMM_YY","MMM YY"], must_contain=["mmm"])
@@ -1092,7 +1821,7 @@ def api_wsr():
 
     insert_cols = []
     insert_vals = []
-    params = []
+    fields = []
 
     # ✅✅ FIX: prevent same db column twice in insert
     seen_cols = set()
@@ -1105,19 +1834,17 @@ def api_wsr():
             continue
         seen_cols.add(dbcol)
 
-        val = payload.get(key)
-
-        # dates
+        # per-field converter, chosen once here instead of per request
         if dbcol in (call_col, visit_col):
-            val = _parse_date(val)
-
-        # times (HH:MM)
-        if dbcol in (turnon_col, printon_col, tstart_col, tend_col, wstart_col, wend_col):
-            val = _parse_time_hhmm(val)
+            conv = _parse_date
+        elif dbcol in (turnon_col, printon_col, tstart_col, tend_col, wstart_col, wend_col):
+            conv = _parse_time_hhmm
+        else:
+            conv = None
 
         insert_cols.append(_qcol(dbcol))
         insert_vals.append("?")
-        params.append(val)
+        fields.append((key, conv))
 
     created_col = _find_col(cols, aliases=["CreatedAt","Created At"], must_contain=["created"])
     if created_col:
@@ -1125,20 +1852,86 @@ def api_wsr():
         insert_vals.append("GETUTCDATE()")
 
     if not insert_cols:
-        return jsonify({"ok": False, "message": "No matching columns found in dbo.WSR"}), 400
+        return "", ()
 
     sql = f"INSERT INTO dbo.WSR ({', '.join(insert_cols)}) VALUES ({', '.join(insert_vals)})"
+    return sql, tuple(fields)
+
+
+def _wsr_params(fields, row):
+    get = row.get
+    return [conv(get(key)) if conv else get(key) for key, conv in fields]
 
+
+@app.post("/api/wsr")
+def api_wsr():
+    if "user" not in session:
+        return jsonify({"ok": False, "message": "Unauthorized"}), 401
+
+    # body parsed straight from the raw bytes (any content type, as before)
+    raw = request.get_data(cache=False)
     try:
-        with get_conn() as conn:
+        payload = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return jsonify({"ok": False, "message": "Invalid JSON"}), 400
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, (dict, list)):
+        return jsonify({"ok": False, "message": "Invalid JSON"}), 400
+    # {"rows": [...]} is the same bulk upload as a bare list
+    if isinstance(payload, dict) and isinstance(payload.get("rows"), list):
+        payload = payload["rows"]
+    cols = _table_columns("dbo.WSR")
+    if not cols:
+        return jsonify({"ok": False, "message": "dbo.WSR table not found"}), 400
+
+    sql, fields = _wsr_insert_plan(cols)
+    if not sql:
+        return jsonify({"ok": False, "message": "No matching columns found in dbo.WSR"}), 400
+
+    # a list payload is a bulk upload: every row goes in one batch / one commit
+    if isinstance(payload, list):
+        rows = [r for r in payload if isinstance(r, dict)]
+        if not rows:
+            return jsonify({"ok": False, "message": "No WSR rows in payload"}), 400
+    else:
+        rows = [payload]
+
+    params_list = [_wsr_params(fields, row) for row in rows]
+
+    try:
+        # a single INSERT commits by itself under autocommit; a batch is one transaction
+        with get_conn(write=len(params_list) > 1) as conn:
             cur = conn.cursor()
-            cur.execute(sql, params)
-            conn.commit()
+            if len(params_list) == 1:
+                cur.execute(sql, params_list[0])
+            else:
+                cur.fast_executemany = True
+                cur.executemany(sql, params_list)
+        if isinstance(payload, list):
+            return jsonify({"ok": True, "count": len(params_list), "message": f"{len(params_list)} WSR rows saved successfully!"})
         return jsonify({"ok": True, "message": "WSR saved successfully!"})
     except Exception as e:
         return jsonify({"ok": False, "message": f"Insert error: {e}"}), 500
 
 
+# ===================== ADMIN =====================
+@app.post("/admin/flush-schema-cache")
+def admin_flush_schema_cache():
+    """Re-read table columns on next use (e.g. after an ALTER TABLE); affects this worker only.
+
+    Cached InstallBase serial details are dropped too (shared when REDIS_URL is set).
+    """
+    need = _require_login_json()
+    if need: return need
+    if _session_scope()[0] != "admin":
+        return _json_err("Admin only", 403)
+
+    flush_schema_cache()
+    _cache_clear("serial_ib")
+    return jsonify({"ok": True})
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,30 @@
+# Gunicorn settings (picked up automatically from the project root),
+# e.g. Azure startup command: gunicorn app:app
+import multiprocessing
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# threaded workers: requests mostly wait on Azure SQL, so threads overlap that
+# wait; each worker process keeps its own pyodbc pool (DB_POOL_MAX connections)
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    # only matters if preload_app is turned on (it is off here): then the master
+    # has imported app.py already, and ODBC connections must not be shared
+    # across processes, so start every worker empty; otherwise app isn't loaded yet
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.reset_pool()
+
+
+def post_worker_init(worker):
+    # app is loaded in this worker now; open DB_POOL_MIN connections up front
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.warm_pool()
@@ -1,8 +1,9 @@
-import os, sys
+import os, re, sys
 import pyodbc
 from dotenv import load_dotenv
 from pathlib import Path
-from datetime import datetime
+from datetime import date
+from functools import lru_cache
 
 load_dotenv(Path(__file__).resolve().parent / ".env")
 
@@ -44,16 +45,34 @@ def clean(v):
         return None
     return v
 
+# %d-%b-%y | %d-%b-%Y, matched once instead of strptime raising per miss
+DATE_RE = re.compile(r"(\d{1,2})-([A-Za-z]{3})-(\d{4}|\d{2})", re.ASCII)
+MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+# bulk files repeat the same few thousand date strings, so parse each once
+@lru_cache(maxsize=65536)
+def _parse_date_str(v: str):
+    m = DATE_RE.fullmatch(v)
+    if not m:
+        return None
+    d, mon, y = m.groups()
+    month = MONTHS.get(mon.lower())
+    if not month:
+        return None
+    year = int(y)
+    if len(y) == 2:
+        year += 1900 if year >= 69 else 2000
+    try:
+        return date(year, month, int(d))
+    except ValueError:
+        return None
+
 def parse_date(v):
     v = clean(v)
     if not v:
         return None
-    for fmt in ("%d-%b-%y", "%d-%b-%Y"):
-        try:
-            return datetime.strptime(v, fmt).date()
-        except ValueError:
-            pass
-    return None
+    return _parse_date_str(v)
 
 def normalize(name: str) -> str:
     # Convert "Sales Invoice No" -> "SALES_INVOICE_NO" like variants